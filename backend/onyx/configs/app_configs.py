@@ -400,6 +400,18 @@ GITLAB_CONNECTOR_INCLUDE_CODE_FILES = (
     os.environ.get("GITLAB_CONNECTOR_INCLUDE_CODE_FILES", "").lower() == "true"
 )
 
+# Send Google API (Drive, Docs, Admin, Gmail) requests over a shared, multiplexed
+# HTTP/2 connection pool instead of httplib2's one-request-per-connection HTTP/1.1.
+# Off by default while this transport is still being validated.
+GOOGLE_API_USE_HTTP2 = os.environ.get("GOOGLE_API_USE_HTTP2", "false").lower() == "true"
+
+# By default Drive files we can't extract content from are still indexed by title.
+# Set to only list file types the connector can read, so the rest are never fetched.
+GOOGLE_DRIVE_CONNECTOR_ONLY_SUPPORTED_FILE_TYPES = (
+    os.environ.get("GOOGLE_DRIVE_CONNECTOR_ONLY_SUPPORTED_FILE_TYPES", "").lower()
+    == "true"
+)
+
 # Typically set to http://localhost:3000 for OAuth connector development
 CONNECTOR_LOCALHOST_OVERRIDE = os.getenv("CONNECTOR_LOCALHOST_OVERRIDE")
 
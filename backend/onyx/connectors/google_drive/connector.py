@@ -1,19 +1,32 @@
+import contextvars
+import queue
+import re
+import threading
+import time
 from collections.abc import Callable
 from collections.abc import Iterator
-from concurrent.futures import as_completed
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from functools import partial
 from typing import Any
+from typing import cast
 
 from google.oauth2.credentials import Credentials as OAuthCredentials  # type: ignore
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials  # type: ignore
 from googleapiclient.errors import HttpError  # type: ignore
 
+from onyx.configs.app_configs import GOOGLE_DRIVE_CONNECTOR_ONLY_SUPPORTED_FILE_TYPES
 from onyx.configs.app_configs import INDEX_BATCH_SIZE
 from onyx.configs.constants import DocumentSource
+from onyx.configs.constants import KV_GOOGLE_DRIVE_USER_ACCESS_CACHE_KEY
 from onyx.connectors.exceptions import ConnectorValidationError
 from onyx.connectors.exceptions import CredentialExpiredError
 from onyx.connectors.exceptions import InsufficientPermissionsError
+from onyx.connectors.google_drive.constants import DRIVE_DRIVES_PAGE_SIZE
+from onyx.connectors.google_drive.constants import DRIVE_FOLDER_TYPE
+from onyx.connectors.google_drive.constants import DRIVE_SHORTCUT_TYPE
 from onyx.connectors.google_drive.doc_conversion import build_slim_document
 from onyx.connectors.google_drive.doc_conversion import (
     convert_drive_item_to_document,
@@ -23,12 +36,16 @@ from onyx.connectors.google_drive.file_retrieval import get_all_files_for_oauth
 from onyx.connectors.google_drive.file_retrieval import get_all_files_in_my_drive
 from onyx.connectors.google_drive.file_retrieval import get_files_in_shared_drive
 from onyx.connectors.google_drive.file_retrieval import get_root_folder_id
+from onyx.connectors.google_drive.file_retrieval import SUPPORTED_MIME_TYPES_FILTER
+from onyx.connectors.google_drive.models import GDriveMimeType
 from onyx.connectors.google_drive.models import GoogleDriveFileType
+from onyx.connectors.google_drive.section_extraction import batch_get_documents
 from onyx.connectors.google_utils.google_auth import get_google_creds
 from onyx.connectors.google_utils.google_utils import execute_paginated_retrieval
 from onyx.connectors.google_utils.resources import get_admin_service
 from onyx.connectors.google_utils.resources import get_drive_service
 from onyx.connectors.google_utils.resources import get_google_docs_service
+from onyx.connectors.google_utils.resources import GoogleDriveService
 from onyx.connectors.google_utils.shared_constants import (
     DB_CREDENTIALS_PRIMARY_ADMIN_KEY,
 )
@@ -36,6 +53,7 @@ from onyx.connectors.google_utils.shared_constants import MISSING_SCOPES_ERROR_S
 from onyx.connectors.google_utils.shared_constants import ONYX_SCOPE_INSTRUCTIONS
 from onyx.connectors.google_utils.shared_constants import SLIM_BATCH_SIZE
 from onyx.connectors.google_utils.shared_constants import USER_FIELDS
+from onyx.connectors.google_utils.shared_constants import USERS_PAGE_SIZE
 from onyx.connectors.interfaces import GenerateDocumentsOutput
 from onyx.connectors.interfaces import GenerateSlimDocumentOutput
 from onyx.connectors.interfaces import LoadConnector
@@ -43,25 +61,67 @@ from onyx.connectors.interfaces import PollConnector
 from onyx.connectors.interfaces import SecondsSinceUnixEpoch
 from onyx.connectors.interfaces import SlimConnector
 from onyx.connectors.models import ConnectorMissingCredentialError
+from onyx.connectors.models import Document
 from onyx.connectors.vision_enabled_connector import VisionEnabledConnector
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
+from onyx.key_value_store.factory import get_kv_store
+from onyx.key_value_store.interface import KvKeyNotFoundError
 from onyx.llm.interfaces import LLM
+from onyx.utils.batching import batch_generator
 from onyx.utils.logger import setup_logger
 from onyx.utils.retry_wrapper import retry_builder
+from onyx.utils.threadpool_concurrency import parallel_yield
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from onyx.utils.threadpool_concurrency import run_in_background
+from onyx.utils.threadpool_concurrency import wait_on_background
 
 logger = setup_logger()
-# TODO: Improve this by using the batch utility: https://googleapis.github.io/google-api-python-client/docs/batch.html
-# All file retrievals could be batched and made at once
+
+_COMMA_SEPARATOR_RE = re.compile(r"\s*,\s*")
+# the last path segment of each url, ignoring any trailing slashes
+_URL_ID_RE = re.compile(r"([^/\n]+)/*$", re.MULTILINE)
+
+# default is ~17mins of retries, don't do that here for cases so we don't
+# waste 17mins everytime we run into a user without access to drive APIs
+_get_root_folder_id_with_retries = retry_builder(tries=3, delay=1)(get_root_folder_id)
+# how long to trust that a user has access to the drive APIs before checking again.
+# Users without access are only skipped for the rest of the run they were checked
+# in, so anyone granted access in the meantime is picked up by the next poll.
+_USER_ACCESS_CACHE_TTL_SECONDS = 6 * 60 * 60
+
+# File conversion runs on threads rather than processes. The connector runs
+# inside a daemonic indexing process which isn't allowed to spawn children, and
+# conversion needs the creds, the vision LLM, and the tenant contextvar for
+# storing images, none of which carry over to a process pool cleanly.
+_CONVERSION_MAX_WORKERS = 8
+_MAX_INFLIGHT_CONVERSIONS = 2 * _CONVERSION_MAX_WORKERS
+_QUEUE_POLL_INTERVAL_SECONDS = 1.0
+# yield whatever docs are ready at least this often, even if the batch isn't full
+_PARTIAL_BATCH_MAX_WAIT_SECONDS = 5.0
+# how long to wait for the listing/fetching threads to wind down after a run ends
+_THREAD_JOIN_TIMEOUT_SECONDS = 10.0
+
+# a batch of a single doc costs the same round trip as fetching it during conversion
+_MIN_DOCS_TO_PREFETCH = 2
+
+_NON_CONVERTIBLE_MIME_TYPES = frozenset([DRIVE_SHORTCUT_TYPE, DRIVE_FOLDER_TYPE])
+
+# A file to convert, along with its prefetched Google Doc structure if it has one
+_FileToConvert = tuple[GoogleDriveFileType, dict[str, Any] | None]
 
 
 def _extract_str_list_from_comma_str(string: str | None) -> list[str]:
     if not string:
         return []
-    return [s.strip() for s in string.split(",") if s.strip()]
+    return [s for s in _COMMA_SEPARATOR_RE.split(string.strip()) if s]
 
 
 def _extract_ids_from_urls(urls: list[str]) -> list[str]:
-    return [url.split("/")[-1] for url in urls]
+    return _URL_ID_RE.findall("\n".join(urls))
+
+
+def _get_file_owner_email(file: GoogleDriveFileType, primary_admin_email: str) -> str:
+    return file.get("owners", [{}])[0].get("emailAddress") or primary_admin_email
 
 
 def _convert_single_file(
@@ -69,8 +129,9 @@ def _convert_single_file(
     primary_admin_email: str,
     file: dict[str, Any],
     image_analysis_llm: LLM | None,
+    prefetched_doc: dict[str, Any] | None = None,
 ) -> Any:
-    user_email = file.get("owners", [{}])[0].get("emailAddress") or primary_admin_email
+    user_email = _get_file_owner_email(file, primary_admin_email)
     user_drive_service = get_drive_service(creds, user_email=user_email)
     docs_service = get_google_docs_service(creds, user_email=user_email)
     return convert_drive_item_to_document(
@@ -78,33 +139,113 @@ def _convert_single_file(
         drive_service=user_drive_service,
         docs_service=docs_service,
         image_analysis_llm=image_analysis_llm,  # pass the LLM so doc_conversion can summarize images
+        prefetched_doc=prefetched_doc,
     )
 
 
-def _process_files_batch(
+def _get_from_queue_nowait(q: "queue.Queue[str]") -> str | None:
+    try:
+        return q.get_nowait()
+    except queue.Empty:
+        return None
+
+
+def _put_unless_stopped(
+    q: "queue.Queue[Any]", item: Any, stop_event: threading.Event
+) -> bool:
+    """Blocks until there is room on q for item, unless stop_event gets set first"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=_QUEUE_POLL_INTERVAL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _is_stopped(stop_event: threading.Event | None) -> bool:
+    return stop_event is not None and stop_event.is_set()
+
+
+def _join_background(task: threading.Thread) -> None:
+    """Waits a bounded amount of time for a pipeline thread to notice it should
+    stop, so an early exit doesn't leave threads crawling that the process would
+    otherwise wait on at shutdown"""
+    task.join(timeout=_THREAD_JOIN_TIMEOUT_SECONDS)
+    if task.is_alive():
+        logger.warning(
+            f"Thread '{task.name}' did not stop within "
+            f"{_THREAD_JOIN_TIMEOUT_SECONDS} seconds"
+        )
+
+
+def _get_converted_doc(future: Future) -> Document | None:
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"Error converting file: {e}")
+        return None
+
+
+def _prefetch_owner_google_docs(
+    creds: Any, owner_email: str, doc_ids: list[str]
+) -> dict[str, dict[str, Any]]:
+    try:
+        docs_service = get_google_docs_service(creds, user_email=owner_email)
+        return batch_get_documents(docs_service, doc_ids)
+    except Exception as e:
+        # e.g. an external owner that can't be impersonated. Prefetching is
+        # only an optimization, these docs get fetched (or fail) one by one
+        # during conversion as usual
+        logger.warning(f"Failed to prefetch google docs owned by '{owner_email}': {e}")
+        return {}
+
+
+def _prefetch_google_docs(
+    creds: Any,
+    primary_admin_email: str,
     files: list[GoogleDriveFileType],
-    convert_func: Callable[[GoogleDriveFileType], Any],
-    batch_size: int,
-) -> GenerateDocumentsOutput:
-    doc_batch = []
-    with ThreadPoolExecutor(max_workers=min(16, len(files))) as executor:
-        for doc in executor.map(convert_func, files):
-            if doc:
-                doc_batch.append(doc)
-                if len(doc_batch) >= batch_size:
-                    yield doc_batch
-                    doc_batch = []
-    if doc_batch:
-        yield doc_batch
+) -> dict[str, dict[str, Any]]:
+    """Batch fetches the structure of all Google Docs in `files`, grouped by the
+    user that will be impersonated to convert them. Media downloads/exports can't
+    be batched, so only the Docs API calls are done here. Owners with too few docs
+    for a batch to save anything are left to the conversion threads, and the
+    remaining owners are fetched in parallel."""
+    doc_ids_by_owner: dict[str, list[str]] = {}
+    for file in files:
+        if file.get("mimeType") == GDriveMimeType.DOC.value:
+            owner_email = _get_file_owner_email(file, primary_admin_email)
+            doc_ids_by_owner.setdefault(owner_email, []).append(file["id"])
+
+    owner_results = run_functions_tuples_in_parallel(
+        [
+            (_prefetch_owner_google_docs, (creds, owner_email, doc_ids))
+            for owner_email, doc_ids in doc_ids_by_owner.items()
+            if len(doc_ids) >= _MIN_DOCS_TO_PREFETCH
+        ],
+        max_workers=_CONVERSION_MAX_WORKERS,
+    )
+
+    prefetched_docs: dict[str, dict[str, Any]] = {}
+    for owner_docs in owner_results:
+        prefetched_docs.update(owner_docs)
+    return prefetched_docs
 
 
 def _clean_requested_drive_ids(
-    requested_drive_ids: set[str],
-    requested_folder_ids: set[str],
+    requested_drive_ids: frozenset[str],
+    requested_folder_ids: frozenset[str],
     all_drive_ids_available: set[str],
 ) -> tuple[set[str], set[str]]:
-    invalid_requested_drive_ids = requested_drive_ids - all_drive_ids_available
-    filtered_folder_ids = requested_folder_ids - all_drive_ids_available
+    if not requested_drive_ids and not requested_folder_ids:
+        return set(), set()
+
+    valid_requested_drive_ids = all_drive_ids_available.intersection(
+        requested_drive_ids
+    )
+    invalid_requested_drive_ids = requested_drive_ids - valid_requested_drive_ids
+    filtered_folder_ids = set(requested_folder_ids)
+    filtered_folder_ids.difference_update(all_drive_ids_available)
     if invalid_requested_drive_ids:
         logger.warning(
             f"Some shared drive IDs were not found. IDs: {invalid_requested_drive_ids}"
@@ -112,7 +253,6 @@ def _clean_requested_drive_ids(
         logger.warning("Checking for folder access instead...")
         filtered_folder_ids.update(invalid_requested_drive_ids)
 
-    valid_requested_drive_ids = requested_drive_ids - invalid_requested_drive_ids
     return valid_requested_drive_ids, filtered_folder_ids
 
 
@@ -183,22 +323,35 @@ class GoogleDriveConnector(
         )
 
         shared_drive_url_list = _extract_str_list_from_comma_str(shared_drive_urls)
-        self._requested_shared_drive_ids = set(
+        # these never change after construction
+        self._requested_shared_drive_ids = frozenset(
             _extract_ids_from_urls(shared_drive_url_list)
         )
 
-        self._requested_my_drive_emails = set(
+        self._requested_my_drive_emails = frozenset(
             _extract_str_list_from_comma_str(my_drive_emails)
         )
 
         shared_folder_url_list = _extract_str_list_from_comma_str(shared_folder_urls)
-        self._requested_folder_ids = set(_extract_ids_from_urls(shared_folder_url_list))
+        self._requested_folder_ids = frozenset(
+            _extract_ids_from_urls(shared_folder_url_list)
+        )
 
         self._primary_admin_email: str | None = None
+        self._google_domain: str | None = None
 
         self._creds: OAuthCredentials | ServiceAccountCredentials | None = None
 
         self._retrieved_ids: set[str] = set()
+        # Also applied to slim retrieval, so pruning removes any unsupported files
+        # that were indexed by title before the filter was turned on
+        self._mime_type_filter = (
+            SUPPORTED_MIME_TYPES_FILTER
+            if GOOGLE_DRIVE_CONNECTOR_ONLY_SUPPORTED_FILE_TYPES
+            else ""
+        )
+        # user email -> (has access to the drive APIs, time.time() when checked)
+        self._user_access_cache: dict[str, tuple[bool, float]] = {}
 
     @property
     def primary_admin_email(self) -> str:
@@ -212,13 +365,13 @@ class GoogleDriveConnector(
 
     @property
     def google_domain(self) -> str:
-        if self._primary_admin_email is None:
+        if self._google_domain is None:
             raise RuntimeError(
                 "Primary admin email missing, "
                 "should not call this property "
                 "before calling load_credentials"
             )
-        return self._primary_admin_email.split("@")[-1]
+        return self._google_domain
 
     @property
     def creds(self) -> OAuthCredentials | ServiceAccountCredentials:
@@ -239,6 +392,7 @@ class GoogleDriveConnector(
                 "should not call this property "
                 "before calling load_credentials"
             )
+        self._google_domain = self.primary_admin_email.split("@")[-1]
 
         self._creds, new_creds_dict = get_google_creds(
             credentials=credentials,
@@ -250,32 +404,47 @@ class GoogleDriveConnector(
     def _update_traversed_parent_ids(self, folder_id: str) -> None:
         self._retrieved_ids.add(folder_id)
 
-    def _get_all_user_emails(self) -> list[str]:
-        # Start with primary admin email
-        user_emails = [self.primary_admin_email]
-
-        # Only fetch additional users if using service account
-        if isinstance(self.creds, OAuthCredentials):
-            return user_emails
-
+    def _list_user_emails(self, query: str) -> list[str]:
+        # services aren't thread-safe, so each call gets the one for its own thread
         admin_service = get_admin_service(
             creds=self.creds,
             user_email=self.primary_admin_email,
         )
-
-        # Get admins first since they're more likely to have access to most files
-        for is_admin in [True, False]:
-            query = "isAdmin=true" if is_admin else "isAdmin=false"
+        return [
+            email
             for user in execute_paginated_retrieval(
                 retrieval_function=admin_service.users().list,
                 list_key="users",
                 fields=USER_FIELDS,
+                maxResults=USERS_PAGE_SIZE,
                 domain=self.google_domain,
                 query=query,
-            ):
-                if email := user.get("primaryEmail"):
-                    if email not in user_emails:
-                        user_emails.append(email)
+            )
+            if (email := user.get("primaryEmail"))
+        ]
+
+    def _get_all_user_emails(self) -> list[str]:
+        # Start with primary admin email
+        user_emails = [self.primary_admin_email]
+
+        # Only fetch additional users if using service account
+        if isinstance(self.creds, OAuthCredentials):
+            return user_emails
+
+        # Admins and non-admins are listed in parallel, but admins are still put
+        # first since they're more likely to have access to most files
+        admin_emails, non_admin_emails = run_functions_tuples_in_parallel(
+            [
+                (self._list_user_emails, ("isAdmin=true",)),
+                (self._list_user_emails, ("isAdmin=false",)),
+            ]
+        )
+
+        seen_emails = set(user_emails)
+        for email in admin_emails + non_admin_emails:
+            if email not in seen_emails:
+                seen_emails.add(email)
+                user_emails.append(email)
         return user_emails
 
     def get_all_drive_ids(self) -> set[str]:
@@ -288,6 +457,7 @@ class GoogleDriveConnector(
         for drive in execute_paginated_retrieval(
             retrieval_function=primary_drive_service.drives().list,
             list_key="drives",
+            pageSize=DRIVE_DRIVES_PAGE_SIZE,
             useDomainAdminAccess=is_service_account,
             fields="drives(id)",
         ):
@@ -300,34 +470,121 @@ class GoogleDriveConnector(
 
         return all_drive_ids
 
+    def _get_user_access_cache_key(self) -> str:
+        # which users can be impersonated depends on the service account's
+        # domain-wide delegation, not just on the admin/domain
+        return KV_GOOGLE_DRIVE_USER_ACCESS_CACHE_KEY.format(
+            f"{cast(ServiceAccountCredentials, self.creds).service_account_email}"
+            f"_{self.primary_admin_email}"
+        )
+
+    def _load_user_access_cache(self) -> None:
+        """
+        Which users have access to the drive APIs rarely changes, so users that have
+        access are kept in the KV store and reused by later runs rather than
+        re-checking every user in the org on every poll. Entries already in memory
+        take precedence.
+        """
+        try:
+            stored = get_kv_store().load(self._get_user_access_cache_key())
+        except KvKeyNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Failed to load cached user drive access: {e}")
+            return
+
+        if not isinstance(stored, dict):
+            logger.warning("Ignoring malformed cached user drive access")
+            return
+
+        now = time.time()
+        for user_email, cached in stored.items():
+            # e.g. left behind by an older version, just check the user again
+            try:
+                has_access, checked_at = cached
+                checked_at = float(checked_at)
+            except (TypeError, ValueError):
+                logger.debug(f"Ignoring malformed cached drive access of {user_email}")
+                continue
+
+            if (
+                has_access is True
+                and user_email not in self._user_access_cache
+                and now - checked_at < _USER_ACCESS_CACHE_TTL_SECONDS
+            ):
+                self._user_access_cache[user_email] = (True, checked_at)
+
+    def _store_user_access_cache(self) -> None:
+        now = time.time()
+        # users without access aren't stored, they get checked again next run
+        unexpired_with_access = {
+            user_email: [has_access, checked_at]
+            for user_email, (has_access, checked_at) in self._user_access_cache.items()
+            if has_access and now - checked_at < _USER_ACCESS_CACHE_TTL_SECONDS
+        }
+        try:
+            get_kv_store().store(
+                self._get_user_access_cache_key(), unexpired_with_access
+            )
+        except Exception as e:
+            # only an optimization, not worth failing the run over
+            logger.warning(f"Failed to store cached user drive access: {e}")
+
+    def _user_has_drive_access(
+        self, user_email: str, drive_service: GoogleDriveService
+    ) -> bool:
+        cached = self._user_access_cache.get(user_email)
+        if cached is not None:
+            has_access, checked_at = cached
+            if time.time() - checked_at < _USER_ACCESS_CACHE_TTL_SECONDS:
+                return has_access
+
+        # validate that the user has access to the drive APIs by performing a simple
+        # request and checking for a 401
+        try:
+            _get_root_folder_id_with_retries(drive_service)
+            has_access = True
+        except HttpError as e:
+            if e.status_code != 401:
+                raise
+            has_access = False
+
+        self._user_access_cache[user_email] = (has_access, time.time())
+        return has_access
+
+    def _handle_drive_access_error(self, user_email: str, error: HttpError) -> None:
+        """
+        Access checks are cached, so a user can lose access to the drive APIs after
+        being checked. Treat that the same as never having had access instead of
+        failing the whole run. Anything other than a 401 is re-raised.
+        """
+        if error.status_code != 401:
+            raise error
+        logger.warning(f"User '{user_email}' lost access to the drive APIs.")
+        self._user_access_cache[user_email] = (False, time.time())
+
     def _impersonate_user_for_retrieval(
         self,
         user_email: str,
         is_slim: bool,
-        filtered_drive_ids: set[str],
-        filtered_folder_ids: set[str],
+        drive_ids_queue: "queue.Queue[str]",
+        folder_ids_queue: "queue.Queue[str]",
+        tried_ids: set[str],
         start: SecondsSinceUnixEpoch | None = None,
         end: SecondsSinceUnixEpoch | None = None,
+        stop_event: threading.Event | None = None,
     ) -> Iterator[GoogleDriveFileType]:
         logger.info(f"Impersonating user {user_email}")
 
         drive_service = get_drive_service(self.creds, user_email)
 
-        # validate that the user has access to the drive APIs by performing a simple
-        # request and checking for a 401
-        try:
-            # default is ~17mins of retries, don't do that here for cases so we don't
-            # waste 17mins everytime we run into a user without access to drive APIs
-            retry_builder(tries=3, delay=1)(get_root_folder_id)(drive_service)
-        except HttpError as e:
-            if e.status_code == 401:
-                # fail gracefully, let the other impersonations continue
-                # one user without access shouldn't block the entire connector
-                logger.warning(
-                    f"User '{user_email}' does not have access to the drive APIs."
-                )
-                return
-            raise
+        if not self._user_has_drive_access(user_email, drive_service):
+            # fail gracefully, let the other impersonations continue
+            # one user without access shouldn't block the entire connector
+            logger.warning(
+                f"User '{user_email}' does not have access to the drive APIs."
+            )
+            return
 
         # if we are including my drives, try to get the current user's my
         # drive if any of the following are true:
@@ -335,16 +592,44 @@ class GoogleDriveConnector(
         # - the current user's email is in the requested emails
         if self.include_my_drives or user_email in self._requested_my_drive_emails:
             logger.info(f"Getting all files in my drive as '{user_email}'")
-            yield from get_all_files_in_my_drive(
-                service=drive_service,
-                update_traversed_ids_func=self._update_traversed_parent_ids,
-                is_slim=is_slim,
-                start=start,
-                end=end,
-            )
+            try:
+                yield from get_all_files_in_my_drive(
+                    service=drive_service,
+                    update_traversed_ids_func=self._update_traversed_parent_ids,
+                    is_slim=is_slim,
+                    start=start,
+                    end=end,
+                    mime_type_filter=self._mime_type_filter,
+                )
+            except HttpError as e:
+                self._handle_drive_access_error(user_email, e)
+                return
+
+        yield from self._retrieve_queued_ids_as_user(
+            user_email=user_email,
+            is_slim=is_slim,
+            drive_ids_queue=drive_ids_queue,
+            folder_ids_queue=folder_ids_queue,
+            tried_ids=tried_ids,
+            start=start,
+            end=end,
+            stop_event=stop_event,
+        )
 
-        remaining_drive_ids = filtered_drive_ids - self._retrieved_ids
-        for drive_id in remaining_drive_ids:
+    def _retrieve_queued_ids_as_user(
+        self,
+        user_email: str,
+        is_slim: bool,
+        drive_ids_queue: "queue.Queue[str]",
+        folder_ids_queue: "queue.Queue[str]",
+        tried_ids: set[str],
+        start: SecondsSinceUnixEpoch | None = None,
+        end: SecondsSinceUnixEpoch | None = None,
+        stop_event: threading.Event | None = None,
+    ) -> Iterator[GoogleDriveFileType]:
+        drive_service = get_drive_service(self.creds, user_email)
+
+        def _crawl_shared_drive(drive_id: str) -> Iterator[GoogleDriveFileType]:
             logger.info(f"Getting files in shared drive '{drive_id}' as '{user_email}'")
             yield from get_files_in_shared_drive(
                 service=drive_service,
@@ -353,10 +638,10 @@ class GoogleDriveConnector(
                 update_traversed_ids_func=self._update_traversed_parent_ids,
                 start=start,
                 end=end,
+                mime_type_filter=self._mime_type_filter,
             )
 
-        remaining_folders = filtered_folder_ids - self._retrieved_ids
-        for folder_id in remaining_folders:
+        def _crawl_folder(folder_id: str) -> Iterator[GoogleDriveFileType]:
             logger.info(f"Getting files in folder '{folder_id}' as '{user_email}'")
             yield from crawl_folders_for_files(
                 service=drive_service,
@@ -365,13 +650,96 @@ class GoogleDriveConnector(
                 update_traversed_ids_func=self._update_traversed_parent_ids,
                 start=start,
                 end=end,
+                mime_type_filter=self._mime_type_filter,
             )
 
+        try:
+            yield from self._crawl_ids_from_queue(
+                drive_ids_queue, _crawl_shared_drive, tried_ids, stop_event
+            )
+            yield from self._crawl_ids_from_queue(
+                folder_ids_queue, _crawl_folder, tried_ids, stop_event
+            )
+        except HttpError as e:
+            self._handle_drive_access_error(user_email, e)
+
+    def _crawl_ids_from_queue(
+        self,
+        retrieval_ids_queue: "queue.Queue[str]",
+        crawl_func: Callable[[str], Iterator[GoogleDriveFileType]],
+        tried_ids: set[str],
+        stop_event: threading.Event | None = None,
+    ) -> Iterator[GoogleDriveFileType]:
+        """
+        Crawls drives/folders taken off a queue shared by all impersonated users, so
+        each one is only crawled by whichever user gets to it first. If nothing was
+        found, the user may just not have access, so the id goes back on the queue
+        for other users to try. tried_ids tracks what the current user has tried.
+        Crawling ends as soon as stop_event is set, leaving a partly crawled id
+        unmarked.
+        """
+        skipped_ids: list[str] = []
+        try:
+            while not _is_stopped(stop_event) and (
+                (retrieval_id := _get_from_queue_nowait(retrieval_ids_queue))
+                is not None
+            ):
+                if retrieval_id in self._retrieved_ids:
+                    continue
+                if retrieval_id in tried_ids:
+                    skipped_ids.append(retrieval_id)
+                    continue
+                tried_ids.add(retrieval_id)
+
+                found_files = False
+                try:
+                    for file in crawl_func(retrieval_id):
+                        found_files = True
+                        yield file
+                        if _is_stopped(stop_event):
+                            return
+                except Exception:
+                    # give other users a chance at it
+                    retrieval_ids_queue.put(retrieval_id)
+                    raise
+
+                if found_files:
+                    self._update_traversed_parent_ids(retrieval_id)
+                else:
+                    retrieval_ids_queue.put(retrieval_id)
+        finally:
+            for retrieval_id in skipped_ids:
+                retrieval_ids_queue.put(retrieval_id)
+
     def _manage_service_account_retrieval(
         self,
         is_slim: bool,
         start: SecondsSinceUnixEpoch | None = None,
         end: SecondsSinceUnixEpoch | None = None,
+        stop_event: threading.Event | None = None,
+    ) -> Iterator[GoogleDriveFileType]:
+        # users found without access by an earlier run of this connector get
+        # another check
+        self._user_access_cache = {
+            user_email: cached
+            for user_email, cached in self._user_access_cache.items()
+            if cached[0]
+        }
+        self._load_user_access_cache()
+        try:
+            yield from self._impersonate_users_for_retrieval(
+                is_slim, start, end, stop_event
+            )
+        finally:
+            # stored even if retrieval fails, so verdicts flipped by a 401 aren't lost
+            self._store_user_access_cache()
+
+    def _impersonate_users_for_retrieval(
+        self,
+        is_slim: bool,
+        start: SecondsSinceUnixEpoch | None = None,
+        end: SecondsSinceUnixEpoch | None = None,
+        stop_event: threading.Event | None = None,
     ) -> Iterator[GoogleDriveFileType]:
         all_org_emails: list[str] = self._get_all_user_emails()
 
@@ -397,24 +765,79 @@ class GoogleDriveConnector(
         logger.info(f"Found {len(folder_ids_to_retrieve)} folders to retrieve")
         logger.debug(f"Folders: {folder_ids_to_retrieve}")
 
-        # Process users in parallel using ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_email = {
-                executor.submit(
-                    self._impersonate_user_for_retrieval,
-                    email,
-                    is_slim,
-                    drive_ids_to_retrieve,
-                    folder_ids_to_retrieve,
-                    start,
-                    end,
-                ): email
+        # Each drive/folder is taken off these queues by exactly one user at a time
+        drive_ids_queue: queue.Queue[str] = queue.Queue()
+        for drive_id in drive_ids_to_retrieve:
+            drive_ids_queue.put(drive_id)
+        folder_ids_queue: queue.Queue[str] = queue.Queue()
+        for folder_id in folder_ids_to_retrieve:
+            folder_ids_queue.put(folder_id)
+        tried_ids_by_user: dict[str, set[str]] = {
+            email: set() for email in all_org_emails
+        }
+
+        # Each user's retrieval is a generator of files, so submitting them to an
+        # executor directly would only parallelize generator creation. Instead we
+        # advance the generators on worker threads and yield files as they arrive.
+        user_retrieval_gens = [
+            self._impersonate_user_for_retrieval(
+                email,
+                is_slim,
+                drive_ids_queue,
+                folder_ids_queue,
+                tried_ids_by_user[email],
+                start,
+                end,
+                stop_event,
+            )
+            for email in all_org_emails
+        ]
+        yield from parallel_yield(
+            user_retrieval_gens, max_workers=10, stop_event=stop_event
+        )
+
+        # Ids put back on the queues by a user that found nothing may have been missed
+        # by users that had already finished, so give those users another go until
+        # nobody has anything left to try
+        while not _is_stopped(stop_event):
+            remaining_ids = (
+                drive_ids_to_retrieve | folder_ids_to_retrieve
+            ) - self._retrieved_ids
+            users_to_retry = [
+                email
                 for email in all_org_emails
-            }
+                if self._user_access_cache.get(email, (False, 0.0))[0]
+                and remaining_ids - tried_ids_by_user[email]
+            ]
+            if not users_to_retry:
+                break
+
+            num_tried_before = sum(len(tried) for tried in tried_ids_by_user.values())
+            yield from parallel_yield(
+                [
+                    self._retrieve_queued_ids_as_user(
+                        user_email=email,
+                        is_slim=is_slim,
+                        drive_ids_queue=drive_ids_queue,
+                        folder_ids_queue=folder_ids_queue,
+                        tried_ids=tried_ids_by_user[email],
+                        start=start,
+                        end=end,
+                        stop_event=stop_event,
+                    )
+                    for email in users_to_retry
+                ],
+                max_workers=10,
+                stop_event=stop_event,
+            )
+            if (
+                sum(len(tried) for tried in tried_ids_by_user.values())
+                == num_tried_before
+            ):
+                break
 
-            # Yield results as they complete
-            for future in as_completed(future_to_email):
-                yield from future.result()
+        if _is_stopped(stop_event):
+            return
 
         remaining_folders = (
             drive_ids_to_retrieve | folder_ids_to_retrieve
@@ -429,6 +852,7 @@ class GoogleDriveConnector(
         is_slim: bool,
         start: SecondsSinceUnixEpoch | None = None,
         end: SecondsSinceUnixEpoch | None = None,
+        stop_event: threading.Event | None = None,
     ) -> Iterator[GoogleDriveFileType]:
         drive_service = get_drive_service(self.creds, self.primary_admin_email)
 
@@ -448,6 +872,7 @@ class GoogleDriveConnector(
                 is_slim=is_slim,
                 start=start,
                 end=end,
+                mime_type_filter=self._mime_type_filter,
             )
 
         all_requested = (
@@ -472,6 +897,8 @@ class GoogleDriveConnector(
             drive_ids_to_retrieve = all_drive_ids
 
         for drive_id in drive_ids_to_retrieve:
+            if _is_stopped(stop_event):
+                return
             logger.info(
                 f"Getting files in shared drive '{drive_id}' as '{self.primary_admin_email}'"
             )
@@ -482,12 +909,15 @@ class GoogleDriveConnector(
                 update_traversed_ids_func=self._update_traversed_parent_ids,
                 start=start,
                 end=end,
+                mime_type_filter=self._mime_type_filter,
             )
 
         # Even if no folders were requested, we still check if any drives were requested
         # that could be folders.
         remaining_folders = folder_ids_to_retrieve - self._retrieved_ids
         for folder_id in remaining_folders:
+            if _is_stopped(stop_event):
+                return
             logger.info(
                 f"Getting files in folder '{folder_id}' as '{self.primary_admin_email}'"
             )
@@ -498,6 +928,7 @@ class GoogleDriveConnector(
                 update_traversed_ids_func=self._update_traversed_parent_ids,
                 start=start,
                 end=end,
+                mime_type_filter=self._mime_type_filter,
             )
 
         remaining_folders = (
@@ -513,6 +944,7 @@ class GoogleDriveConnector(
         is_slim: bool,
         start: SecondsSinceUnixEpoch | None = None,
         end: SecondsSinceUnixEpoch | None = None,
+        stop_event: threading.Event | None = None,
     ) -> Iterator[GoogleDriveFileType]:
         retrieval_method = (
             self._manage_service_account_retrieval
@@ -523,62 +955,201 @@ class GoogleDriveConnector(
             is_slim=is_slim,
             start=start,
             end=end,
+            stop_event=stop_event,
         )
 
         return drive_files
 
-    def _extract_docs_from_google_drive(
+    def _list_files_for_conversion(
         self,
+        listed_files_queue: "queue.Queue[GoogleDriveFileType | None]",
+        stop_event: threading.Event,
         start: SecondsSinceUnixEpoch | None = None,
         end: SecondsSinceUnixEpoch | None = None,
-    ) -> GenerateDocumentsOutput:
-        # Create a larger process pool for file conversion
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            # Prepare a partial function with the credentials and admin email
-            convert_func = partial(
-                _convert_single_file,
-                self.creds,
-                self.primary_admin_email,
-                image_analysis_llm=self.image_analysis_llm,  # Use the mixin's LLM
+    ) -> None:
+        """Lists the files to convert onto listed_files_queue, followed by a None"""
+        try:
+            for file in self._fetch_drive_items(
+                is_slim=False, start=start, end=end, stop_event=stop_event
+            ):
+                # these never convert to a document, so don't spend a trip
+                # through the conversion pool on them
+                if file.get("mimeType") in _NON_CONVERTIBLE_MIME_TYPES:
+                    continue
+                if not _put_unless_stopped(listed_files_queue, file, stop_event):
+                    return
+        finally:
+            _put_unless_stopped(listed_files_queue, None, stop_event)
+
+    def _fetch_files_for_conversion(
+        self,
+        files_queue: "queue.Queue[_FileToConvert | None]",
+        stop_event: threading.Event,
+        start: SecondsSinceUnixEpoch | None = None,
+        end: SecondsSinceUnixEpoch | None = None,
+    ) -> None:
+        """
+        Producer for _extract_docs_from_google_drive. Groups the listed files so the
+        Google Docs among them can be batch prefetched, then puts every file, along
+        with its prefetched Google Doc structure if any, on the bounded files_queue,
+        which blocks fetching whenever the consumer falls behind. If listing stalls,
+        the files found so far are handed over without waiting for a full group.
+        A None is always put on the queue when done so the consumer knows to stop.
+        """
+
+        def _enqueue_batch(files_batch: list[GoogleDriveFileType]) -> bool:
+            prefetched_docs = _prefetch_google_docs(
+                self.creds, self.primary_admin_email, files_batch
+            )
+            return all(
+                _put_unless_stopped(
+                    files_queue, (file, prefetched_docs.get(file["id"])), stop_event
+                )
+                for file in files_batch
             )
 
-            # Fetch files in batches
+        listed_files_queue: queue.Queue[GoogleDriveFileType | None] = queue.Queue(
+            maxsize=self.batch_size
+        )
+        lister = run_in_background(
+            self._list_files_for_conversion,
+            listed_files_queue,
+            stop_event,
+            start,
+            end,
+        )
+        try:
             files_batch: list[GoogleDriveFileType] = []
-            for file in self._fetch_drive_items(is_slim=False, start=start, end=end):
-                files_batch.append(file)
+            file: GoogleDriveFileType | None = None
+            while not stop_event.is_set():
+                try:
+                    file = listed_files_queue.get(timeout=_QUEUE_POLL_INTERVAL_SECONDS)
+                except queue.Empty:
+                    # listing is slow, don't hold back the files found so far
+                    if files_batch and not _enqueue_batch(files_batch):
+                        return
+                    files_batch = []
+                    continue
 
+                if file is None:
+                    break
+                files_batch.append(file)
                 if len(files_batch) >= self.batch_size:
-                    # Process the batch
-                    futures = [
-                        executor.submit(convert_func, file) for file in files_batch
-                    ]
-                    documents = []
-                    for future in as_completed(futures):
-                        try:
-                            doc = future.result()
-                            if doc is not None:
-                                documents.append(doc)
-                        except Exception as e:
-                            logger.error(f"Error converting file: {e}")
-
-                    if documents:
-                        yield documents
+                    if not _enqueue_batch(files_batch):
+                        return
                     files_batch = []
 
-            # Process any remaining files
-            if files_batch:
-                futures = [executor.submit(convert_func, file) for file in files_batch]
-                documents = []
-                for future in as_completed(futures):
+            # this includes what was listed before any error while listing
+            if files_batch and not _enqueue_batch(files_batch):
+                return
+            # re-raise anything that went wrong while listing files
+            wait_on_background(lister)
+        finally:
+            _put_unless_stopped(files_queue, None, stop_event)
+            # nothing more is taken off listed_files_queue, so stop listing too
+            stop_event.set()
+            _join_background(lister)
+
+    def _extract_docs_from_google_drive(
+        self,
+        start: SecondsSinceUnixEpoch | None = None,
+        end: SecondsSinceUnixEpoch | None = None,
+    ) -> GenerateDocumentsOutput:
+        # Prepare a partial function with the credentials and admin email
+        convert_func = partial(
+            _convert_single_file,
+            self.creds,
+            self.primary_admin_email,
+            image_analysis_llm=self.image_analysis_llm,  # Use the mixin's LLM
+        )
+
+        # Bounds the number of fetched files held in memory awaiting conversion
+        files_queue: queue.Queue[_FileToConvert | None] = queue.Queue(
+            maxsize=self.batch_size * 2
+        )
+        stop_event = threading.Event()
+        producer = run_in_background(
+            self._fetch_files_for_conversion, files_queue, stop_event, start, end
+        )
+
+        # One pool for the whole run rather than one per batch. It only lives as
+        # long as the run, so connectors that never convert files (e.g. the ones
+        # built for permission syncing) never hold on to threads.
+        executor = ThreadPoolExecutor(
+            max_workers=_CONVERSION_MAX_WORKERS, thread_name_prefix="gdrive"
+        )
+        # Keep enough conversions in flight that the pool never sits idle
+        # waiting on the slowest file of a batch
+        inflight: set[Future] = set()
+        try:
+            item: _FileToConvert | None = None
+            fetching_done = False
+            doc_batch: list[Document] = []
+            last_yield_time = time.monotonic()
+            while not fetching_done or inflight:
+                # Don't make the indexing pipeline wait on slow crawls or
+                # conversions to fill up the batch
+                if (
+                    doc_batch
+                    and time.monotonic() - last_yield_time
+                    >= _PARTIAL_BATCH_MAX_WAIT_SECONDS
+                ):
+                    yield doc_batch
+                    doc_batch = []
+                    last_yield_time = time.monotonic()
+
+                while not fetching_done and len(inflight) < _MAX_INFLIGHT_CONVERSIONS:
                     try:
-                        doc = future.result()
-                        if doc is not None:
-                            documents.append(doc)
-                    except Exception as e:
-                        logger.error(f"Error converting file: {e}")
+                        # only block on fetching if there are no conversions
+                        # to wait on instead
+                        item = files_queue.get(
+                            block=not inflight,
+                            timeout=_QUEUE_POLL_INTERVAL_SECONDS,
+                        )
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        fetching_done = True
+                        break
+
+                    file, prefetched_doc = item
+                    inflight.add(
+                        executor.submit(
+                            # propagate the tenant contextvar to the conversion threads
+                            contextvars.copy_context().run,
+                            convert_func,
+                            file,
+                            prefetched_doc=prefetched_doc,
+                        )
+                    )
+
+                if not inflight:
+                    continue
 
-                if documents:
-                    yield documents
+                done, inflight = wait(
+                    inflight,
+                    timeout=_QUEUE_POLL_INTERVAL_SECONDS,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if doc := _get_converted_doc(future):
+                        doc_batch.append(doc)
+                        if len(doc_batch) >= self.batch_size:
+                            yield doc_batch
+                            doc_batch = []
+                            last_yield_time = time.monotonic()
+
+            if doc_batch:
+                yield doc_batch
+
+            # re-raise anything that went wrong while fetching files
+            wait_on_background(producer)
+        finally:
+            stop_event.set()
+            # don't convert files nobody will consume if we stopped early, or
+            # wait on the conversions already running
+            executor.shutdown(wait=False, cancel_futures=True)
+            _join_background(producer)
 
     def load_from_state(self) -> GenerateDocumentsOutput:
         try:
@@ -604,26 +1175,24 @@ class GoogleDriveConnector(
         end: SecondsSinceUnixEpoch | None = None,
         callback: IndexingHeartbeatInterface | None = None,
     ) -> GenerateSlimDocumentOutput:
-        slim_batch = []
-        for file in self._fetch_drive_items(
-            is_slim=True,
-            start=start,
-            end=end,
-        ):
-            if doc := build_slim_document(file):
-                slim_batch.append(doc)
-            if len(slim_batch) >= SLIM_BATCH_SIZE:
-                yield slim_batch
-                slim_batch = []
-                if callback:
-                    if callback.should_stop():
-                        raise RuntimeError(
-                            "_extract_slim_docs_from_google_drive: Stop signal detected"
-                        )
-
-                    callback.progress("_extract_slim_docs_from_google_drive", 1)
-
-        yield slim_batch
+        slim_docs = (
+            slim_doc
+            for file in self._fetch_drive_items(
+                is_slim=True,
+                start=start,
+                end=end,
+            )
+            if (slim_doc := build_slim_document(file))
+        )
+        for slim_batch in batch_generator(slim_docs, SLIM_BATCH_SIZE):
+            yield slim_batch
+            if callback:
+                if callback.should_stop():
+                    raise RuntimeError(
+                        "_extract_slim_docs_from_google_drive: Stop signal detected"
+                    )
+
+                callback.progress("_extract_slim_docs_from_google_drive", 1)
 
     def retrieve_all_slim_documents(
         self,
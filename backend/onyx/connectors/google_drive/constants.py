@@ -2,3 +2,7 @@ UNSUPPORTED_FILE_TYPE_CONTENT = ""  # keep empty for now
 DRIVE_FOLDER_TYPE = "application/vnd.google-apps.folder"
 DRIVE_SHORTCUT_TYPE = "application/vnd.google-apps.shortcut"
 DRIVE_FILE_TYPE = "application/vnd.google-apps.file"
+
+# Max page sizes allowed by the Drive list endpoints
+DRIVE_FILES_PAGE_SIZE = 1000
+DRIVE_DRIVES_PAGE_SIZE = 100
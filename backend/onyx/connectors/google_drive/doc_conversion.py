@@ -2,6 +2,7 @@ import io
 from datetime import datetime
 from datetime import timezone
 from tempfile import NamedTemporaryFile
+from typing import Any
 
 import openpyxl  # type: ignore
 from googleapiclient.discovery import build  # type: ignore
@@ -315,10 +316,12 @@ def convert_drive_item_to_document(
     drive_service: GoogleDriveService,
     docs_service: GoogleDocsService,
     image_analysis_llm: LLM | None,
+    prefetched_doc: dict[str, Any] | None = None,
 ) -> Document | None:
     """
     Main entry point for converting a Google Drive file => Document object.
     Now we accept an optional `llm` to pass to `_extract_sections_basic`.
+    `prefetched_doc` is the Google Doc structure if it was already batch fetched.
     """
     try:
         # skip shortcuts or folders
@@ -331,7 +334,9 @@ def convert_drive_item_to_document(
         if file.get("mimeType") == GDriveMimeType.DOC.value:
             try:
                 # get_document_sections is the advanced approach for Google Docs
-                sections = get_document_sections(docs_service, file["id"])
+                sections = get_document_sections(
+                    docs_service, file["id"], doc=prefetched_doc
+                )
             except Exception as e:
                 logger.warning(
                     f"Failed to pull google doc sections from '{file['name']}': {e}. "
@@ -5,8 +5,10 @@ from typing import Any
 
 from googleapiclient.discovery import Resource  # type: ignore
 
+from onyx.connectors.google_drive.constants import DRIVE_FILES_PAGE_SIZE
 from onyx.connectors.google_drive.constants import DRIVE_FOLDER_TYPE
 from onyx.connectors.google_drive.constants import DRIVE_SHORTCUT_TYPE
+from onyx.connectors.google_drive.models import GDriveMimeType
 from onyx.connectors.google_drive.models import GoogleDriveFileType
 from onyx.connectors.google_utils.google_utils import execute_paginated_retrieval
 from onyx.connectors.interfaces import SecondsSinceUnixEpoch
@@ -24,6 +26,17 @@ SLIM_FILE_FIELDS = (
 )
 FOLDER_FIELDS = "nextPageToken, files(id, name, permissions, modifiedTime, webViewLink, shortcutDetails)"
 
+# Matches the files doc_conversion can extract content from (images included),
+# for leaving everything else out of the listing altogether
+SUPPORTED_MIME_TYPES_FILTER = (
+    " and ("
+    + " or ".join(
+        [f"mimeType = '{mime_type.value}'" for mime_type in GDriveMimeType]
+        + ["mimeType contains 'image/'"]
+    )
+    + ")"
+)
+
 
 def _generate_time_range_filter(
     start: SecondsSinceUnixEpoch | None = None,
@@ -53,6 +66,7 @@ def _get_folders_in_parent(
     for file in execute_paginated_retrieval(
         retrieval_function=service.files().list,
         list_key="files",
+        pageSize=DRIVE_FILES_PAGE_SIZE,
         continue_on_404_or_403=True,
         corpora="allDrives",
         supportsAllDrives=True,
@@ -69,14 +83,17 @@ def _get_files_in_parent(
     start: SecondsSinceUnixEpoch | None = None,
     end: SecondsSinceUnixEpoch | None = None,
     is_slim: bool = False,
+    mime_type_filter: str = "",
 ) -> Iterator[GoogleDriveFileType]:
     query = f"mimeType != '{DRIVE_FOLDER_TYPE}' and '{parent_id}' in parents"
     query += " and trashed = false"
     query += _generate_time_range_filter(start, end)
+    query += mime_type_filter
 
     for file in execute_paginated_retrieval(
         retrieval_function=service.files().list,
         list_key="files",
+        pageSize=DRIVE_FILES_PAGE_SIZE,
         continue_on_404_or_403=True,
         corpora="allDrives",
         supportsAllDrives=True,
@@ -94,6 +111,7 @@ def crawl_folders_for_files(
     update_traversed_ids_func: Callable[[str], None],
     start: SecondsSinceUnixEpoch | None = None,
     end: SecondsSinceUnixEpoch | None = None,
+    mime_type_filter: str = "",
 ) -> Iterator[GoogleDriveFileType]:
     """
     This function starts crawling from any folder. It is slower though.
@@ -108,6 +126,7 @@ def crawl_folders_for_files(
         start=start,
         end=end,
         parent_id=parent_id,
+        mime_type_filter=mime_type_filter,
     ):
         found_files = True
         yield file
@@ -127,6 +146,7 @@ def crawl_folders_for_files(
             update_traversed_ids_func=update_traversed_ids_func,
             start=start,
             end=end,
+            mime_type_filter=mime_type_filter,
         )
 
 
@@ -137,6 +157,7 @@ def get_files_in_shared_drive(
     update_traversed_ids_func: Callable[[str], None] = lambda _: None,
     start: SecondsSinceUnixEpoch | None = None,
     end: SecondsSinceUnixEpoch | None = None,
+    mime_type_filter: str = "",
 ) -> Iterator[GoogleDriveFileType]:
     # If we know we are going to folder crawl later, we can cache the folders here
     # Get all folders being queried and add them to the traversed set
@@ -146,6 +167,7 @@ def get_files_in_shared_drive(
     for file in execute_paginated_retrieval(
         retrieval_function=service.files().list,
         list_key="files",
+        pageSize=DRIVE_FILES_PAGE_SIZE,
         continue_on_404_or_403=True,
         corpora="drive",
         driveId=drive_id,
@@ -163,9 +185,11 @@ def get_files_in_shared_drive(
     file_query = f"mimeType != '{DRIVE_FOLDER_TYPE}'"
     file_query += " and trashed = false"
     file_query += _generate_time_range_filter(start, end)
+    file_query += mime_type_filter
     yield from execute_paginated_retrieval(
         retrieval_function=service.files().list,
         list_key="files",
+        pageSize=DRIVE_FILES_PAGE_SIZE,
         continue_on_404_or_403=True,
         corpora="drive",
         driveId=drive_id,
@@ -182,6 +206,7 @@ def get_all_files_in_my_drive(
     is_slim: bool = False,
     start: SecondsSinceUnixEpoch | None = None,
     end: SecondsSinceUnixEpoch | None = None,
+    mime_type_filter: str = "",
 ) -> Iterator[GoogleDriveFileType]:
     # If we know we are going to folder crawl later, we can cache the folders here
     # Get all folders being queried and add them to the traversed set
@@ -192,6 +217,7 @@ def get_all_files_in_my_drive(
     for file in execute_paginated_retrieval(
         retrieval_function=service.files().list,
         list_key="files",
+        pageSize=DRIVE_FILES_PAGE_SIZE,
         corpora="user",
         fields=SLIM_FILE_FIELDS if is_slim else FILE_FIELDS,
         q=folder_query,
@@ -206,9 +232,11 @@ def get_all_files_in_my_drive(
     file_query += " and trashed = false"
     file_query += " and 'me' in owners"
     file_query += _generate_time_range_filter(start, end)
+    file_query += mime_type_filter
     yield from execute_paginated_retrieval(
         retrieval_function=service.files().list,
         list_key="files",
+        pageSize=DRIVE_FILES_PAGE_SIZE,
         corpora="user",
         fields=SLIM_FILE_FIELDS if is_slim else FILE_FIELDS,
         q=file_query,
@@ -224,6 +252,7 @@ def get_all_files_for_oauth(
     is_slim: bool = False,
     start: SecondsSinceUnixEpoch | None = None,
     end: SecondsSinceUnixEpoch | None = None,
+    mime_type_filter: str = "",
 ) -> Iterator[GoogleDriveFileType]:
     should_get_all = (
         include_shared_drives and include_my_drives and include_files_shared_with_me
@@ -233,6 +262,7 @@ def get_all_files_for_oauth(
     file_query = f"mimeType != '{DRIVE_FOLDER_TYPE}'"
     file_query += " and trashed = false"
     file_query += _generate_time_range_filter(start, end)
+    file_query += mime_type_filter
 
     if not should_get_all:
         if include_files_shared_with_me and not include_my_drives:
@@ -243,6 +273,7 @@ def get_all_files_for_oauth(
     yield from execute_paginated_retrieval(
         retrieval_function=service.files().list,
         list_key="files",
+        pageSize=DRIVE_FILES_PAGE_SIZE,
         corpora=corpora,
         includeItemsFromAllDrives=should_get_all,
         supportsAllDrives=should_get_all,
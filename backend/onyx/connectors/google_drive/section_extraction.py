@@ -1,9 +1,17 @@
 from typing import Any
 
+from googleapiclient.errors import HttpError  # type: ignore
 from pydantic import BaseModel
 
 from onyx.connectors.google_utils.resources import GoogleDocsService
 from onyx.connectors.models import Section
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Google caps the number of calls in a single batch request at 100
+# https://developers.google.com/docs/api/how-tos/batch
+DOCS_BATCH_REQUEST_LIMIT = 100
 
 
 class CurrentHeading(BaseModel):
@@ -34,13 +42,50 @@ def _extract_text_from_paragraph(paragraph: dict[str, Any]) -> str:
     return "".join(text_elements)
 
 
+def batch_get_documents(
+    docs_service: GoogleDocsService,
+    doc_ids: list[str],
+) -> dict[str, dict[str, Any]]:
+    """Fetches the structure of many Google Docs using batched HTTP requests.
+    Docs that fail to be fetched are left out of the result, so callers can fall
+    back to fetching them individually."""
+    documents: dict[str, dict[str, Any]] = {}
+    # request ids must be unique within a batch
+    doc_ids = list(dict.fromkeys(doc_ids))
+
+    def _on_document(request_id: str, response: Any, exception: Any) -> None:
+        if exception is not None:
+            logger.debug(
+                f"Failed to batch fetch google doc '{request_id}': {exception}"
+            )
+            return
+        documents[request_id] = response
+
+    for i in range(0, len(doc_ids), DOCS_BATCH_REQUEST_LIMIT):
+        batch = docs_service.new_batch_http_request(callback=_on_document)
+        for doc_id in doc_ids[i : i + DOCS_BATCH_REQUEST_LIMIT]:
+            batch.add(
+                docs_service.documents().get(documentId=doc_id), request_id=doc_id
+            )
+        try:
+            batch.execute()
+        except HttpError as e:
+            logger.warning(f"Failed to batch fetch google docs: {e}")
+
+    return documents
+
+
 def get_document_sections(
     docs_service: GoogleDocsService,
     doc_id: str,
+    doc: dict[str, Any] | None = None,
 ) -> list[Section]:
-    """Extracts sections from a Google Doc, including their headings and content"""
+    """Extracts sections from a Google Doc, including their headings and content.
+    If the document structure was already fetched (e.g. via batch_get_documents)
+    it can be passed in as `doc` to skip the request."""
     # Fetch the document structure
-    doc = docs_service.documents().get(documentId=doc_id).execute()
+    if doc is None:
+        doc = docs_service.documents().get(documentId=doc_id).execute()
 
     # Get the content
     content = doc.get("body", {}).get("content", [])
@@ -39,6 +39,8 @@ class GoogleOAuthAuthenticationMethod(str, PyEnum):
 
 
 USER_FIELDS = "nextPageToken, users(primaryEmail)"
+# Max page size allowed by the Admin SDK users().list endpoint
+USERS_PAGE_SIZE = 500
 
 # Error message substrings
 MISSING_SCOPES_ERROR_STR = "client not authorized for any of the scopes requested"
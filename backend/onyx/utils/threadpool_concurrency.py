@@ -1,10 +1,17 @@
 import contextvars
+import itertools
 import threading
 import uuid
 from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
 from concurrent.futures import as_completed
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from typing import Any
+from typing import cast
 from typing import Generic
 from typing import TypeVar
 
@@ -190,3 +197,77 @@ def wait_on_background(task: TimeoutThread[R]) -> R:
         raise task.exception
 
     return task.result
+
+
+_GENERATOR_EXHAUSTED = object()
+
+
+def _next_or_exhausted(gen: Iterator[Any]) -> Any:
+    return next(gen, _GENERATOR_EXHAUSTED)
+
+
+_STOP_CHECK_INTERVAL_SECONDS = 1.0
+
+
+def parallel_yield(
+    gens: Iterable[Iterator[R]],
+    max_workers: int = 10,
+    stop_event: threading.Event | None = None,
+) -> Iterator[R]:
+    """
+    Advances multiple generators in parallel and yields their items as soon as they
+    are ready. Each generator only ever has one pending next() call, so a generator
+    is never advanced by two threads at once. Items from the same generator are
+    yielded in order, items from different generators are interleaved.
+
+    At most max_workers generators are in progress at a time, the next one is only
+    started once another is exhausted. This keeps the bookkeeping per item
+    proportional to max_workers rather than to the number of generators.
+
+    If stop_event is given, no more items are yielded or requested once it is set,
+    even while waiting on a generator.
+
+    Exceptions raised by a generator are propagated to the caller.
+    As with all python thread parallelism, this is only useful for I/O bound generators.
+    """
+    gens_to_start = iter(gens)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    future_to_gen: dict[Future, Iterator[R]] = {}
+
+    def _advance(gen: Iterator[R]) -> None:
+        future = executor.submit(
+            contextvars.copy_context().run, _next_or_exhausted, gen
+        )
+        future_to_gen[future] = gen
+
+    try:
+        for gen in itertools.islice(gens_to_start, max_workers):
+            _advance(gen)
+        while future_to_gen:
+            if stop_event is not None and stop_event.is_set():
+                return
+            done, _ = wait(
+                future_to_gen,
+                timeout=(
+                    _STOP_CHECK_INTERVAL_SECONDS if stop_event is not None else None
+                ),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                gen = future_to_gen.pop(future)
+                result = future.result()
+                if result is _GENERATOR_EXHAUSTED:
+                    next_gen = next(gens_to_start, None)
+                    if next_gen is not None:
+                        _advance(next_gen)
+                    continue
+
+                yield cast(R, result)
+                _advance(gen)
+    finally:
+        # don't keep advancing generators if the caller stops early or one of
+        # the generators raises. Once stopped, generators still mid-step are
+        # expected to notice stop_event themselves, so they aren't waited on.
+        executor.shutdown(
+            wait=stop_event is None or not stop_event.is_set(), cancel_futures=True
+        )
@@ -0,0 +1,28 @@
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import pytest
+
+from onyx.connectors.google_drive.connector import GoogleDriveConnector
+
+
+@pytest.fixture
+def make_drive_connector() -> Callable[..., GoogleDriveConnector]:
+    """Builds a connector with fake credentials loaded and the vision LLM off"""
+
+    def _make_drive_connector(**kwargs: Any) -> GoogleDriveConnector:
+        with patch(
+            "onyx.connectors.vision_enabled_connector.get_image_extraction_and_analysis_enabled",
+            return_value=False,
+        ):
+            connector = GoogleDriveConnector(**kwargs)
+        connector._creds = MagicMock(
+            service_account_email="indexer@project.iam.gserviceaccount.com"
+        )
+        connector._primary_admin_email = "admin@example.com"
+        connector._google_domain = "example.com"
+        return connector
+
+    return _make_drive_connector
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from onyx.connectors.google_drive.connector import GoogleDriveConnector
+from onyx.connectors.google_drive.models import GoogleDriveFileType
+
+_CONNECTOR_MODULE = "onyx.connectors.google_drive.connector"
+
+
+def _fake_convert(
+    creds: Any,
+    primary_admin_email: str,
+    file: GoogleDriveFileType,
+    image_analysis_llm: Any = None,
+    prefetched_doc: dict[str, Any] | None = None,
+) -> str:
+    return file["id"]
+
+
+@pytest.fixture
+def fast_polling() -> Iterator[None]:
+    with patch(f"{_CONNECTOR_MODULE}._QUEUE_POLL_INTERVAL_SECONDS", 0.01), patch(
+        f"{_CONNECTOR_MODULE}._prefetch_google_docs", return_value={}
+    ):
+        yield
+
+
+def _run_pipeline(
+    connector: GoogleDriveConnector,
+    fetch_files: Callable[..., Iterator[GoogleDriveFileType]],
+    convert: Callable[..., Any] = _fake_convert,
+) -> Generator[list[Any], None, None]:
+    with patch.object(
+        GoogleDriveConnector, "_fetch_drive_items", side_effect=fetch_files
+    ), patch(f"{_CONNECTOR_MODULE}._convert_single_file", side_effect=convert):
+        yield from connector._extract_docs_from_google_drive()
+
+
+def test_batches_fill_to_batch_size(
+    make_drive_connector: Callable[..., GoogleDriveConnector], fast_polling: None
+) -> None:
+    connector = make_drive_connector(include_my_drives=True, batch_size=4)
+
+    def _fetch_files(**kwargs: Any) -> Iterator[GoogleDriveFileType]:
+        for i in range(10):
+            yield {"id": f"file_{i}"}
+
+    batches = list(_run_pipeline(connector, _fetch_files))
+
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert sorted(doc for batch in batches for doc in batch) == sorted(
+        f"file_{i}" for i in range(10)
+    )
+
+
+def test_partial_batch_is_flushed_after_max_wait(
+    make_drive_connector: Callable[..., GoogleDriveConnector], fast_polling: None
+) -> None:
+    connector = make_drive_connector(include_my_drives=True, batch_size=4)
+    fetching_can_finish = threading.Event()
+
+    def _fetch_files(**kwargs: Any) -> Iterator[GoogleDriveFileType]:
+        yield {"id": "file_0"}
+        # a slow crawl that doesn't produce anything else for a while
+        fetching_can_finish.wait(timeout=10)
+        yield {"id": "file_1"}
+
+    with patch(f"{_CONNECTOR_MODULE}._PARTIAL_BATCH_MAX_WAIT_SECONDS", 0.1):
+        batches = _run_pipeline(connector, _fetch_files)
+        assert next(batches) == ["file_0"]
+        fetching_can_finish.set()
+        assert list(batches) == [["file_1"]]
+
+
+def test_producer_errors_are_raised_after_remaining_docs(
+    make_drive_connector: Callable[..., GoogleDriveConnector], fast_polling: None
+) -> None:
+    connector = make_drive_connector(include_my_drives=True, batch_size=4)
+
+    def _fetch_files(**kwargs: Any) -> Iterator[GoogleDriveFileType]:
+        for i in range(6):
+            yield {"id": f"file_{i}"}
+        raise ValueError("fetching failed")
+
+    docs: list[str] = []
+    with pytest.raises(ValueError, match="fetching failed"):
+        for batch in _run_pipeline(connector, _fetch_files):
+            docs.extend(batch)
+
+    # the error doesn't lose the last partial batch
+    assert sorted(docs) == [f"file_{i}" for i in range(6)]
+
+
+def test_closing_early_stops_fetching_and_conversions(
+    make_drive_connector: Callable[..., GoogleDriveConnector], fast_polling: None
+) -> None:
+    connector = make_drive_connector(include_my_drives=True, batch_size=4)
+    lock = threading.Lock()
+    num_fetched = 0
+    num_converted = 0
+
+    def _fetch_files(**kwargs: Any) -> Iterator[GoogleDriveFileType]:
+        nonlocal num_fetched
+        while True:
+            with lock:
+                num_fetched += 1
+            yield {"id": f"file_{num_fetched}"}
+
+    def _slow_convert(*args: Any, **kwargs: Any) -> str:
+        nonlocal num_converted
+        time.sleep(0.05)
+        with lock:
+            num_converted += 1
+        return _fake_convert(*args, **kwargs)
+
+    batches = _run_pipeline(connector, _fetch_files, _slow_convert)
+    next(batches)
+    batches.close()
+
+    # give the producer and the running conversions a chance to wind down
+    time.sleep(0.3)
+    with lock:
+        fetched_after_close, converted_after_close = num_fetched, num_converted
+    time.sleep(0.3)
+    with lock:
+        assert num_fetched == fetched_after_close
+        assert num_converted == converted_after_close
+
+    # conversions that hadn't started yet were cancelled rather than run
+    assert converted_after_close < fetched_after_close
+
+
+def test_closing_early_stops_all_pipeline_threads(
+    make_drive_connector: Callable[..., GoogleDriveConnector], fast_polling: None
+) -> None:
+    connector = make_drive_connector(include_my_drives=True, batch_size=4)
+    threads_before = set(threading.enumerate())
+
+    def _fetch_files(
+        stop_event: threading.Event, **kwargs: Any
+    ) -> Iterator[GoogleDriveFileType]:
+        yield {"id": "file_0"}
+        # a crawl that finds nothing else until it is told to stop
+        while not stop_event.is_set():
+            time.sleep(0.01)
+
+    batches = _run_pipeline(connector, _fetch_files)
+    with patch(f"{_CONNECTOR_MODULE}._PARTIAL_BATCH_MAX_WAIT_SECONDS", 0.1):
+        assert next(batches) == ["file_0"]
+    batches.close()
+
+    new_threads = set(threading.enumerate()) - threads_before
+    # the listing and fetching threads are joined before close() returns
+    assert [t for t in new_threads if not t.name.startswith("gdrive")] == []
+    # and the conversion pool is shut down with the run, not kept around
+    for thread in new_threads:
+        thread.join(timeout=1)
+        assert not thread.is_alive()
@@ -0,0 +1,43 @@
+from onyx.connectors.google_drive.connector import _clean_requested_drive_ids
+from onyx.connectors.google_drive.connector import _extract_ids_from_urls
+from onyx.connectors.google_drive.connector import _extract_str_list_from_comma_str
+
+
+def test_extract_str_list_from_comma_str() -> None:
+    assert _extract_str_list_from_comma_str(None) == []
+    assert _extract_str_list_from_comma_str("") == []
+    assert _extract_str_list_from_comma_str("a@b.com") == ["a@b.com"]
+    assert _extract_str_list_from_comma_str(" a@b.com , c@d.com,e@f.com ") == [
+        "a@b.com",
+        "c@d.com",
+        "e@f.com",
+    ]
+    assert _extract_str_list_from_comma_str("a,,b, ,") == ["a", "b"]
+
+
+def test_extract_ids_from_urls() -> None:
+    assert _extract_ids_from_urls([]) == []
+    assert _extract_ids_from_urls(
+        [
+            "https://drive.google.com/drive/folders/folder_id_1",
+            "https://drive.google.com/drive/folders/folder_id_2/",
+            "shared_drive_id",
+        ]
+    ) == ["folder_id_1", "folder_id_2", "shared_drive_id"]
+
+
+def test_clean_requested_drive_ids() -> None:
+    assert _clean_requested_drive_ids(
+        requested_drive_ids=frozenset(),
+        requested_folder_ids=frozenset(),
+        all_drive_ids_available={"drive_1"},
+    ) == (set(), set())
+
+    # requested drive ids that aren't shared drives are checked as folders instead
+    drive_ids, folder_ids = _clean_requested_drive_ids(
+        requested_drive_ids=frozenset({"drive_1", "not_a_drive"}),
+        requested_folder_ids=frozenset({"folder_1", "drive_2"}),
+        all_drive_ids_available={"drive_1", "drive_2"},
+    )
+    assert drive_ids == {"drive_1"}
+    assert folder_ids == {"folder_1", "not_a_drive"}
@@ -0,0 +1,108 @@
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from google.auth.exceptions import RefreshError  # type: ignore
+
+from onyx.connectors.google_drive.connector import _prefetch_google_docs
+from onyx.connectors.google_drive.models import GDriveMimeType
+from onyx.connectors.google_drive.section_extraction import batch_get_documents
+
+
+def _make_google_doc(doc_id: str, owner_email: str) -> dict[str, Any]:
+    return {
+        "id": doc_id,
+        "mimeType": GDriveMimeType.DOC.value,
+        "owners": [{"emailAddress": owner_email}],
+    }
+
+
+class _FakeBatch:
+    """Mimics BatchHttpRequest, including rejecting duplicate request ids"""
+
+    def __init__(self, callback: Callable[[str, Any, Any], None]) -> None:
+        self._callback = callback
+        self.request_ids: list[str] = []
+
+    def add(self, request: Any, request_id: str) -> None:
+        if request_id in self.request_ids:
+            raise KeyError("A request with this ID already exists: %s" % request_id)
+        self.request_ids.append(request_id)
+
+    def execute(self) -> None:
+        for request_id in self.request_ids:
+            self._callback(request_id, {"documentId": request_id}, None)
+
+
+def test_batch_get_documents_dedupes_doc_ids() -> None:
+    batches: list[_FakeBatch] = []
+
+    def _new_batch(callback: Callable[[str, Any, Any], None]) -> _FakeBatch:
+        batches.append(_FakeBatch(callback))
+        return batches[-1]
+
+    docs_service = MagicMock()
+    docs_service.new_batch_http_request.side_effect = _new_batch
+
+    documents = batch_get_documents(docs_service, ["doc_1", "doc_2", "doc_1"])
+
+    assert set(documents) == {"doc_1", "doc_2"}
+    assert [batch.request_ids for batch in batches] == [["doc_1", "doc_2"]]
+
+
+def test_prefetch_google_docs_skips_failed_owner_groups() -> None:
+    files = [
+        _make_google_doc("external_doc_1", "someone@external.com"),
+        _make_google_doc("external_doc_2", "someone@external.com"),
+        _make_google_doc("internal_doc_1", "user@example.com"),
+        _make_google_doc("internal_doc_2", "user@example.com"),
+        {"id": "pdf", "mimeType": GDriveMimeType.PDF.value},
+    ]
+
+    def _batch_get_documents(
+        docs_service: Any, doc_ids: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        if docs_service == "someone@external.com":
+            raise RefreshError("unauthorized_client")
+        return {doc_id: {"documentId": doc_id} for doc_id in doc_ids}
+
+    with patch(
+        "onyx.connectors.google_drive.connector.get_google_docs_service",
+        side_effect=lambda creds, user_email: user_email,
+    ), patch(
+        "onyx.connectors.google_drive.connector.batch_get_documents",
+        side_effect=_batch_get_documents,
+    ):
+        prefetched_docs = _prefetch_google_docs(MagicMock(), "admin@example.com", files)
+
+    # the external docs are left to be fetched on their own during conversion
+    assert prefetched_docs == {
+        "internal_doc_1": {"documentId": "internal_doc_1"},
+        "internal_doc_2": {"documentId": "internal_doc_2"},
+    }
+
+
+def test_prefetch_google_docs_skips_single_doc_owners() -> None:
+    files = [
+        _make_google_doc("lone_doc", "someone@example.com"),
+        _make_google_doc("doc_1", "user@example.com"),
+        _make_google_doc("doc_2", "user@example.com"),
+    ]
+
+    with patch(
+        "onyx.connectors.google_drive.connector.get_google_docs_service",
+        side_effect=lambda creds, user_email: user_email,
+    ), patch(
+        "onyx.connectors.google_drive.connector.batch_get_documents",
+        side_effect=lambda docs_service, doc_ids: {
+            doc_id: {"documentId": doc_id} for doc_id in doc_ids
+        },
+    ) as mock_batch_get_documents:
+        prefetched_docs = _prefetch_google_docs(MagicMock(), "admin@example.com", files)
+
+    # a lone doc is fetched during conversion rather than in a batch of one
+    mock_batch_get_documents.assert_called_once_with(
+        "user@example.com", ["doc_1", "doc_2"]
+    )
+    assert set(prefetched_docs) == {"doc_1", "doc_2"}
@@ -0,0 +1,172 @@
+import queue
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from onyx.connectors.google_drive.connector import GoogleDriveConnector
+from onyx.connectors.google_drive.models import GoogleDriveFileType
+
+_CONNECTOR_MODULE = "onyx.connectors.google_drive.connector"
+
+
+def _retrieve_as_service_account(
+    connector: GoogleDriveConnector,
+    user_emails: list[str],
+    drive_ids: set[str],
+    drive_ids_by_user: dict[str, set[str]],
+) -> tuple[list[GoogleDriveFileType], Counter[tuple[str, str]]]:
+    """Runs service account retrieval over shared drives, where each user can only
+    see the drives in drive_ids_by_user. Returns the files and the crawl counts."""
+    crawls: Counter[tuple[str, str]] = Counter()
+    lock = threading.Lock()
+
+    def _get_files_in_shared_drive(
+        service: str, drive_id: str, **kwargs: Any
+    ) -> Iterator[GoogleDriveFileType]:
+        with lock:
+            crawls[(service, drive_id)] += 1
+        # let the users' retrievals interleave
+        time.sleep(0.01)
+        if drive_id in drive_ids_by_user[service]:
+            yield {"id": f"{drive_id}_file"}
+
+    with patch.object(
+        connector, "_get_all_user_emails", return_value=user_emails
+    ), patch.object(connector, "get_all_drive_ids", return_value=drive_ids), patch(
+        f"{_CONNECTOR_MODULE}.get_drive_service",
+        side_effect=lambda creds, user_email: user_email,
+    ), patch(
+        f"{_CONNECTOR_MODULE}._get_root_folder_id_with_retries"
+    ), patch(
+        f"{_CONNECTOR_MODULE}.get_files_in_shared_drive",
+        side_effect=_get_files_in_shared_drive,
+    ), patch(
+        f"{_CONNECTOR_MODULE}.get_kv_store", side_effect=RuntimeError("no kv store")
+    ):
+        files = list(connector._manage_service_account_retrieval(is_slim=False))
+
+    return files, crawls
+
+
+@pytest.fixture
+def connector(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+) -> GoogleDriveConnector:
+    return make_drive_connector(include_shared_drives=True)
+
+
+def test_drive_put_back_is_picked_up_by_another_user(
+    connector: GoogleDriveConnector,
+) -> None:
+    # only 10 users are retrieved for at a time, so the one user that can see the
+    # drive only starts once the others have tried it and put it back
+    user_emails = [f"user_{i}@example.com" for i in range(10)]
+    user_emails.append("drive_member@example.com")
+    drive_ids_by_user: dict[str, set[str]] = {email: set() for email in user_emails}
+    drive_ids_by_user["drive_member@example.com"] = {"drive_1"}
+
+    files, crawls = _retrieve_as_service_account(
+        connector, user_emails, {"drive_1"}, drive_ids_by_user
+    )
+
+    assert files == [{"id": "drive_1_file"}]
+    assert crawls[("drive_member@example.com", "drive_1")] == 1
+    assert sum(crawls.values()) > 1
+
+
+def test_retrieval_ends_when_no_user_finds_anything(
+    connector: GoogleDriveConnector,
+) -> None:
+    user_emails = [f"user_{i}@example.com" for i in range(3)]
+    drive_ids = {"drive_1", "drive_2"}
+    files, crawls = _retrieve_as_service_account(
+        connector,
+        user_emails,
+        drive_ids,
+        {email: set() for email in user_emails},
+    )
+
+    assert files == []
+    # every user tried every drive exactly once before giving up
+    assert crawls == Counter(
+        {(email, drive_id): 1 for email in user_emails for drive_id in drive_ids}
+    )
+
+
+def test_retrieved_drives_are_never_crawled_again(
+    connector: GoogleDriveConnector,
+) -> None:
+    user_emails = [f"user_{i}@example.com" for i in range(20)]
+    drive_ids = {f"drive_{i}" for i in range(10)}
+    # half of the drives can be seen by everyone, the other half by one user each
+    drive_ids_by_user = {
+        email: {f"drive_{i}" for i in range(5)} | {f"drive_{5 + j % 5}"}
+        for j, email in enumerate(user_emails)
+    }
+    files, crawls = _retrieve_as_service_account(
+        connector, user_emails, drive_ids, drive_ids_by_user
+    )
+
+    assert sorted(file["id"] for file in files) == sorted(
+        f"{drive_id}_file" for drive_id in drive_ids
+    )
+    # a user never tries the same drive twice
+    assert max(crawls.values()) == 1
+    # and a drive is only crawled successfully once
+    successful_crawls = Counter(
+        drive_id for (email, drive_id) in crawls if drive_id in drive_ids_by_user[email]
+    )
+    assert set(successful_crawls.values()) == {1}
+
+
+def test_crawl_ids_from_queue(connector: GoogleDriveConnector) -> None:
+    connector._retrieved_ids.add("already_retrieved")
+    retrieval_ids_queue: queue.Queue[str] = queue.Queue()
+    for retrieval_id in ["already_retrieved", "tried_before", "empty", "folder"]:
+        retrieval_ids_queue.put(retrieval_id)
+    crawled: list[str] = []
+
+    def _crawl(retrieval_id: str) -> Iterator[GoogleDriveFileType]:
+        crawled.append(retrieval_id)
+        if retrieval_id == "folder":
+            yield {"id": "file"}
+
+    files = list(
+        connector._crawl_ids_from_queue(retrieval_ids_queue, _crawl, {"tried_before"})
+    )
+
+    assert files == [{"id": "file"}]
+    assert crawled == ["empty", "folder"]
+    assert "folder" in connector._retrieved_ids
+    # ids this user couldn't get anything from are left for other users
+    assert sorted(retrieval_ids_queue.queue) == ["empty", "tried_before"]
+
+
+def test_crawl_ids_from_queue_stops_on_stop_event(
+    connector: GoogleDriveConnector,
+) -> None:
+    retrieval_ids_queue: queue.Queue[str] = queue.Queue()
+    for retrieval_id in ["folder_1", "folder_2"]:
+        retrieval_ids_queue.put(retrieval_id)
+    stop_event = threading.Event()
+
+    def _crawl(retrieval_id: str) -> Iterator[GoogleDriveFileType]:
+        yield {"id": f"{retrieval_id}_file_1"}
+        yield {"id": f"{retrieval_id}_file_2"}
+
+    files = connector._crawl_ids_from_queue(
+        retrieval_ids_queue, _crawl, set(), stop_event
+    )
+    assert next(files) == {"id": "folder_1_file_1"}
+    stop_event.set()
+
+    assert list(files) == []
+    # the partly crawled folder isn't marked as retrieved
+    assert "folder_1" not in connector._retrieved_ids
+    assert list(retrieval_ids_queue.queue) == ["folder_2"]
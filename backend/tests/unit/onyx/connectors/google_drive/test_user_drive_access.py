@@ -0,0 +1,299 @@
+import queue
+import time
+from collections.abc import Callable
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import httplib2  # type: ignore
+import pytest
+from googleapiclient.errors import HttpError  # type: ignore
+
+from onyx.connectors.google_drive.connector import _USER_ACCESS_CACHE_TTL_SECONDS
+from onyx.connectors.google_drive.connector import GoogleDriveConnector
+from onyx.connectors.google_drive.models import GoogleDriveFileType
+from onyx.key_value_store.interface import KeyValueStore
+from onyx.key_value_store.interface import KvKeyNotFoundError
+from onyx.utils.special_types import JSON_ro
+
+_CONNECTOR_MODULE = "onyx.connectors.google_drive.connector"
+_USER_EMAIL = "user@example.com"
+
+
+def _http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), b"")
+
+
+class _FakeKvStore(KeyValueStore):
+    def __init__(self) -> None:
+        self.values: dict[str, JSON_ro] = {}
+
+    def store(self, key: str, val: JSON_ro, encrypt: bool = False) -> None:
+        self.values[key] = val
+
+    def load(self, key: str) -> JSON_ro:
+        if key not in self.values:
+            raise KvKeyNotFoundError()
+        return self.values[key]
+
+    def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+
+
+class _BrokenKvStore(KeyValueStore):
+    def store(self, key: str, val: JSON_ro, encrypt: bool = False) -> None:
+        raise RuntimeError("redis is down")
+
+    def load(self, key: str) -> JSON_ro:
+        raise RuntimeError("redis is down")
+
+    def delete(self, key: str) -> None:
+        raise RuntimeError("redis is down")
+
+
+@pytest.fixture
+def kv_store() -> Iterator[_FakeKvStore]:
+    kv_store = _FakeKvStore()
+    with patch(f"{_CONNECTOR_MODULE}.get_kv_store", return_value=kv_store):
+        yield kv_store
+
+
+def test_lost_access_after_cached_check_skips_user(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    # a stale verdict from before the user lost access
+    connector._user_access_cache[_USER_EMAIL] = (True, time.time())
+
+    def _my_drive_files(**kwargs: Any) -> Iterator[GoogleDriveFileType]:
+        yield {"id": "file_1"}
+        raise _http_error(401)
+
+    with patch(f"{_CONNECTOR_MODULE}.get_drive_service"), patch(
+        f"{_CONNECTOR_MODULE}.get_all_files_in_my_drive", side_effect=_my_drive_files
+    ), patch(f"{_CONNECTOR_MODULE}._get_root_folder_id_with_retries") as access_probe:
+        files = list(
+            connector._impersonate_user_for_retrieval(
+                user_email=_USER_EMAIL,
+                is_slim=False,
+                drive_ids_queue=queue.Queue(),
+                folder_ids_queue=queue.Queue(),
+                tried_ids=set(),
+            )
+        )
+
+    access_probe.assert_not_called()
+    assert files == [{"id": "file_1"}]
+    assert connector._user_access_cache[_USER_EMAIL][0] is False
+
+
+def test_lost_access_while_crawling_puts_id_back(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+) -> None:
+    connector = make_drive_connector(include_shared_drives=True)
+    connector._user_access_cache[_USER_EMAIL] = (True, time.time())
+    drive_ids_queue: queue.Queue[str] = queue.Queue()
+    drive_ids_queue.put("drive_1")
+
+    def _shared_drive_files(**kwargs: Any) -> Iterator[GoogleDriveFileType]:
+        raise _http_error(401)
+        yield
+
+    with patch(f"{_CONNECTOR_MODULE}.get_drive_service"), patch(
+        f"{_CONNECTOR_MODULE}.get_files_in_shared_drive",
+        side_effect=_shared_drive_files,
+    ):
+        files = list(
+            connector._impersonate_user_for_retrieval(
+                user_email=_USER_EMAIL,
+                is_slim=False,
+                drive_ids_queue=drive_ids_queue,
+                folder_ids_queue=queue.Queue(),
+                tried_ids=set(),
+            )
+        )
+
+    assert files == []
+    assert connector._user_access_cache[_USER_EMAIL][0] is False
+    # another user can still pick up the drive
+    assert drive_ids_queue.get_nowait() == "drive_1"
+
+
+def test_non_401_errors_are_raised(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    connector._user_access_cache[_USER_EMAIL] = (True, time.time())
+
+    with patch(f"{_CONNECTOR_MODULE}.get_drive_service"), patch(
+        f"{_CONNECTOR_MODULE}.get_all_files_in_my_drive",
+        side_effect=_http_error(500),
+    ):
+        retrieval = connector._impersonate_user_for_retrieval(
+            user_email=_USER_EMAIL,
+            is_slim=False,
+            drive_ids_queue=queue.Queue(),
+            folder_ids_queue=queue.Queue(),
+            tried_ids=set(),
+        )
+        with pytest.raises(HttpError) as exc_info:
+            list(retrieval)
+        assert exc_info.value.status_code == 500
+
+    assert connector._user_access_cache[_USER_EMAIL][0] is True
+
+
+def test_user_access_cache_persists_across_connectors(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+    kv_store: _FakeKvStore,
+) -> None:
+    now = time.time()
+    expired = now - _USER_ACCESS_CACHE_TTL_SECONDS - 1
+    connector = make_drive_connector(include_my_drives=True)
+    connector._user_access_cache = {
+        "has_access@example.com": (True, now),
+        "no_access@example.com": (False, now),
+        "expired@example.com": (True, expired),
+    }
+    connector._store_user_access_cache()
+
+    next_connector = make_drive_connector(include_my_drives=True)
+    next_connector._load_user_access_cache()
+
+    # users without access are checked again by the next run
+    assert next_connector._user_access_cache == {
+        "has_access@example.com": (True, now),
+    }
+
+
+def test_load_user_access_cache(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+    kv_store: _FakeKvStore,
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    # nothing stored yet
+    connector._load_user_access_cache()
+    assert connector._user_access_cache == {}
+
+    now = time.time()
+    connector._user_access_cache = {
+        "checked_this_run@example.com": (False, now),
+        "expired@example.com": (True, now - _USER_ACCESS_CACHE_TTL_SECONDS - 1),
+    }
+    connector._store_user_access_cache()
+    # simulate entries that expired after being stored
+    (key,) = kv_store.values
+    kv_store.values[key] = {
+        "checked_this_run@example.com": [True, now],
+        "expired@example.com": [True, now - _USER_ACCESS_CACHE_TTL_SECONDS - 1],
+        "stored@example.com": [True, now],
+    }
+    connector._user_access_cache = {"checked_this_run@example.com": (False, now)}
+    connector._load_user_access_cache()
+
+    # what was checked in memory wins over what was stored
+    assert connector._user_access_cache == {
+        "checked_this_run@example.com": (False, now),
+        "stored@example.com": (True, now),
+    }
+
+
+def test_load_user_access_cache_skips_malformed_entries(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+    kv_store: _FakeKvStore,
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    now = time.time()
+    kv_store.values[connector._get_user_access_cache_key()] = {
+        "old_format@example.com": True,
+        "too_short@example.com": [True],
+        "bad_time@example.com": [True, "yesterday"],
+        "stored@example.com": [True, now],
+    }
+    connector._load_user_access_cache()
+    assert connector._user_access_cache == {"stored@example.com": (True, now)}
+
+    kv_store.values[connector._get_user_access_cache_key()] = ["not", "a", "dict"]
+    next_connector = make_drive_connector(include_my_drives=True)
+    next_connector._load_user_access_cache()
+    assert next_connector._user_access_cache == {}
+
+
+def test_user_access_cache_key_depends_on_service_account(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+    kv_store: _FakeKvStore,
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    connector._user_access_cache = {_USER_EMAIL: (True, time.time())}
+    connector._store_user_access_cache()
+
+    other_connector = make_drive_connector(include_my_drives=True)
+    other_connector._creds = MagicMock(
+        service_account_email="other@project.iam.gserviceaccount.com"
+    )
+    other_connector._load_user_access_cache()
+
+    assert other_connector._user_access_cache == {}
+
+
+def test_user_access_cache_ignores_kv_store_errors(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    connector._user_access_cache = {_USER_EMAIL: (True, time.time())}
+
+    with patch(f"{_CONNECTOR_MODULE}.get_kv_store", return_value=_BrokenKvStore()):
+        connector._store_user_access_cache()
+        connector._load_user_access_cache()
+
+    assert connector._user_access_cache[_USER_EMAIL][0] is True
+
+
+def test_lost_access_is_forgotten_even_if_retrieval_fails(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+    kv_store: _FakeKvStore,
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    connector._user_access_cache = {_USER_EMAIL: (True, time.time())}
+    connector._store_user_access_cache()
+
+    def _failing_retrieval(*args: Any) -> Iterator[GoogleDriveFileType]:
+        connector._handle_drive_access_error(_USER_EMAIL, _http_error(401))
+        raise RuntimeError("something else went wrong")
+        yield
+
+    with patch.object(
+        connector, "_impersonate_users_for_retrieval", side_effect=_failing_retrieval
+    ):
+        with pytest.raises(RuntimeError):
+            list(connector._manage_service_account_retrieval(is_slim=False))
+
+    next_connector = make_drive_connector(include_my_drives=True)
+    next_connector._load_user_access_cache()
+    # the stale "has access" entry is gone, so the next run checks again
+    assert _USER_EMAIL not in next_connector._user_access_cache
+
+
+def test_no_access_is_rechecked_by_the_next_run(
+    make_drive_connector: Callable[..., GoogleDriveConnector],
+    kv_store: _FakeKvStore,
+) -> None:
+    connector = make_drive_connector(include_my_drives=True)
+    connector._user_access_cache = {
+        _USER_EMAIL: (False, time.time()),
+        "has_access@example.com": (True, time.time()),
+    }
+    retrieved_with_cache: list[dict[str, tuple[bool, float]]] = []
+
+    def _retrieval(*args: Any) -> Iterator[GoogleDriveFileType]:
+        retrieved_with_cache.append(dict(connector._user_access_cache))
+        yield from ()
+
+    with patch.object(
+        connector, "_impersonate_users_for_retrieval", side_effect=_retrieval
+    ):
+        list(connector._manage_service_account_retrieval(is_slim=False))
+
+    (cache,) = retrieved_with_cache
+    assert set(cache) == {"has_access@example.com"}
@@ -0,0 +1,133 @@
+import gzip
+import io
+import json
+import re
+
+import httpx
+import pytest
+from google.oauth2.credentials import Credentials as OAuthCredentials  # type: ignore
+from google_auth_httplib2 import AuthorizedHttp  # type: ignore
+from googleapiclient.discovery import build  # type: ignore
+from googleapiclient.discovery import Resource  # type: ignore
+from googleapiclient.errors import HttpError  # type: ignore
+from googleapiclient.http import MediaIoBaseDownload  # type: ignore
+
+from onyx.connectors.google_drive.section_extraction import batch_get_documents
+from onyx.connectors.google_utils.resources import _HttpxHttp
+
+_TOKEN = "test_token"
+
+
+def _build_service(
+    service_name: str, service_version: str, transport: httpx.MockTransport
+) -> Resource:
+    http = AuthorizedHttp(
+        OAuthCredentials(token=_TOKEN),
+        http=_HttpxHttp(httpx.Client(transport=transport)),
+    )
+    return build(service_name, service_version, http=http)
+
+
+def test_json_request() -> None:
+    requests: list[httpx.Request] = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"files": [{"id": "file_1"}]})
+
+    drive_service = _build_service("drive", "v3", httpx.MockTransport(_handler))
+    result = drive_service.files().list(pageSize=5).execute()
+
+    assert result == {"files": [{"id": "file_1"}]}
+    (request,) = requests
+    assert request.url.path == "/drive/v3/files"
+    assert request.url.params["pageSize"] == "5"
+    assert request.headers["authorization"] == f"Bearer {_TOKEN}"
+
+
+def test_gzipped_json_request() -> None:
+    body = json.dumps({"id": "file_1", "name": "a" * 1000}).encode()
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            content=gzip.compress(body),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+
+    drive_service = _build_service("drive", "v3", httpx.MockTransport(_handler))
+    result = drive_service.files().get(fileId="file_1").execute()
+
+    assert result == json.loads(body)
+
+
+def test_http_error_status() -> None:
+    def _handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            404, json={"error": {"code": 404, "message": "File not found"}}
+        )
+
+    drive_service = _build_service("drive", "v3", httpx.MockTransport(_handler))
+    with pytest.raises(HttpError) as exc_info:
+        drive_service.files().get(fileId="missing").execute()
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.reason == "File not found"
+
+
+@pytest.mark.parametrize("gzipped", [False, True])
+def test_get_media_download(gzipped: bool) -> None:
+    file_bytes = b"0123456789" * 1000
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["alt"] == "media"
+        if gzipped:
+            return httpx.Response(
+                200,
+                content=gzip.compress(file_bytes),
+                headers={"Content-Encoding": "gzip"},
+            )
+        return httpx.Response(200, content=file_bytes)
+
+    drive_service = _build_service("drive", "v3", httpx.MockTransport(_handler))
+    assert drive_service.files().get_media(fileId="file_1").execute() == file_bytes
+
+    # the download is only considered done once content-length bytes were read
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(
+        buffer, drive_service.files().get_media(fileId="file_1")
+    )
+    _, done = downloader.next_chunk()
+    assert done
+    assert buffer.getvalue() == file_bytes
+
+
+def test_batch_request() -> None:
+    def _handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/batch"
+        boundary = "batch_response_boundary"
+        parts = []
+        for content_id in re.findall(r"Content-ID: <(.+?)>", request.content.decode()):
+            doc_id = content_id.split("+")[-1].strip()
+            status = "404 Not Found" if doc_id == "missing" else "200 OK"
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: application/json\r\n\r\n"
+                f"{json.dumps({'documentId': doc_id})}\r\n"
+            )
+        return httpx.Response(
+            200,
+            content="".join(parts) + f"--{boundary}--\r\n",
+            headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+        )
+
+    docs_service = _build_service("docs", "v1", httpx.MockTransport(_handler))
+    documents = batch_get_documents(docs_service, ["doc_1", "missing", "doc_2"])
+
+    assert documents == {
+        "doc_1": {"documentId": "doc_1"},
+        "doc_2": {"documentId": "doc_2"},
+    }
@@ -1,8 +1,11 @@
 import contextvars
+import threading
 import time
+from collections.abc import Iterator
 
 import pytest
 
+from onyx.utils.threadpool_concurrency import parallel_yield
 from onyx.utils.threadpool_concurrency import run_in_background
 from onyx.utils.threadpool_concurrency import run_with_timeout
 from onyx.utils.threadpool_concurrency import wait_on_background
@@ -148,3 +151,93 @@ def test_multiple_background_tasks() -> None:
 
     # Verify tasks ran in parallel (total time should be ~0.2s, not ~0.6s)
     assert 0.2 <= elapsed < 0.4  # Allow some buffer for test environment variations
+
+
+def test_parallel_yield_yields_all_items_in_per_generator_order() -> None:
+    """Test that parallel_yield yields every item and keeps each generator's order"""
+
+    def numbers(start: int, count: int) -> Iterator[int]:
+        for i in range(start, start + count):
+            time.sleep(0.01)
+            yield i
+
+    gens = [numbers(0, 5), numbers(100, 3), numbers(200, 0)]
+    results = list(parallel_yield(gens, max_workers=3))
+
+    assert sorted(results) == [0, 1, 2, 3, 4, 100, 101, 102]
+    assert [r for r in results if r < 100] == [0, 1, 2, 3, 4]
+    assert [r for r in results if r >= 100] == [100, 101, 102]
+
+
+def test_parallel_yield_runs_generators_in_parallel() -> None:
+    """Test that slow generators are advanced concurrently"""
+
+    def slow_gen(value: int) -> Iterator[int]:
+        time.sleep(0.2)
+        yield value
+
+    start_time = time.time()
+    results = list(parallel_yield([slow_gen(i) for i in range(3)], max_workers=3))
+    elapsed = time.time() - start_time
+
+    assert sorted(results) == [0, 1, 2]
+    assert elapsed < 0.4
+
+
+def test_parallel_yield_limits_generators_in_progress() -> None:
+    """Test that only max_workers generators are started at a time"""
+    lock = threading.Lock()
+    in_progress = 0
+    max_in_progress = 0
+
+    def tracked_gen(value: int) -> Iterator[int]:
+        nonlocal in_progress, max_in_progress
+        with lock:
+            in_progress += 1
+            max_in_progress = max(max_in_progress, in_progress)
+        try:
+            for i in range(3):
+                time.sleep(0.01)
+                yield value * 10 + i
+        finally:
+            with lock:
+                in_progress -= 1
+
+    results = list(parallel_yield((tracked_gen(i) for i in range(10)), max_workers=2))
+
+    assert sorted(results) == sorted(v * 10 + i for v in range(10) for i in range(3))
+    assert max_in_progress == 2
+
+
+def test_parallel_yield_propagates_exceptions() -> None:
+    """Test that exceptions raised inside a generator reach the caller"""
+
+    def error_gen() -> Iterator[int]:
+        yield 1
+        raise ValueError("Test generator error")
+
+    with pytest.raises(ValueError) as exc_info:
+        list(parallel_yield([error_gen()]))
+
+    assert "Test generator error" in str(exc_info.value)
+
+
+def test_parallel_yield_stops_when_stop_event_is_set() -> None:
+    """Test that a set stop_event ends iteration without waiting on a stuck generator"""
+    stop_event = threading.Event()
+    release = threading.Event()
+
+    def stuck_gen() -> Iterator[int]:
+        yield 1
+        release.wait(timeout=10)
+        yield 2
+
+    results = parallel_yield([stuck_gen()], stop_event=stop_event)
+    assert next(results) == 1
+
+    threading.Timer(0.1, stop_event.set).start()
+    start_time = time.time()
+    assert list(results) == []
+    assert time.time() - start_time < 5
+
+    release.set()